@@ -8,19 +8,37 @@ from __future__ import annotations
 import re
 from typing import List, Tuple
 
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+
+# Call to action appended to every description (override via `cta=`).
+CTA_TEMPLATE = (
+    "Reposted with permission from the creator.\n"
+    "Like, comment & subscribe for more! ❤️"
+)
+
+# Words never used as tags.
+STOPWORDS = frozenset({
+    "the", "and", "a", "to", "in", "of", "for", "on", "is", "with",
+    "this", "that", "it", "you", "from", "are", "as", "be", "at",
+    "by", "an", "or", "have", "was", "but", "not",
+})
+
 
 def _sanitize_text(text: str, max_len: int = 100) -> str:
     """Trim whitespace, collapse spaces, and cut at a word boundary."""
     if not text:
         return ""
     text = text.strip()
-    text = re.sub(r"\s+", " ", text)
+    text = _WS_RE.sub(" ", text)
     if len(text) > max_len:
         text = text[:max_len].rsplit(" ", 1)[0]
     return text
 
 
-def generate_seo_from_caption(caption: str) -> Tuple[str, str, List[str]]:
+def generate_seo_from_caption(
+    caption: str, cta: str | None = None
+) -> Tuple[str, str, List[str]]:
     """
     Given the original Instagram caption, return:
       - title (max ~70 chars)
@@ -40,29 +58,16 @@ def generate_seo_from_caption(caption: str) -> Tuple[str, str, List[str]]:
     description = caption.strip()
     if description:
         description += "\n\n"
-    description += (
-        "Reposted with permission from the creator.\n"
-        "Like, comment & subscribe for more! ❤️"
-    )
+    description += CTA_TEMPLATE if cta is None else cta
 
     # Tags: simple word-based extraction
-    words = re.findall(r"[A-Za-z0-9]+", caption.lower())
-    stopwords = {
-        "the", "and", "a", "to", "in", "of", "for", "on", "is", "with",
-        "this", "that", "it", "you", "from", "are", "as", "be", "at",
-        "by", "an", "or", "have", "was", "but", "not",
-    }
-
     tags: List[str] = []
-    for w in words:
-        if len(w) < 3:
-            continue
-        if w.isdigit():
-            continue
-        if w in stopwords:
+    seen: set[str] = set()
+    for w in _WORD_RE.findall(caption.lower()):
+        if len(w) < 3 or w.isdigit() or w in STOPWORDS or w in seen:
             continue
-        if w not in tags:
-            tags.append(w)
+        seen.add(w)
+        tags.append(w)
         if len(tags) >= 15:
             break
 
@@ -2,8 +2,10 @@
 """
 Main automation script:
 
-- Reads state.json to know which post index to upload next.
-- Fetches all video posts from TARGET_IG_USERNAME (@jenjenivive by default).
+- Reads state.json: a queue of video shortcodes from TARGET_IG_USERNAME
+  (@jenjenivive by default), oldest → newest, and the next index to upload.
+- Builds the queue by walking the whole profile once; later runs only fetch
+  posts newer than the queue (usually a single page).
 - Downloads the selected post's video and caption.
 - Generates YouTube title/description/tags from caption.
 - Uploads the video to YouTube as a Short (if vertical + <60s).
@@ -13,17 +15,26 @@ Main automation script:
 
 from __future__ import annotations
 
+import atexit
+import errno
+import http.client
 import json
 import os
+import random
 import shutil
+import ssl
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Iterator, TextIO
 
 from dotenv import load_dotenv
+import httplib2
 import instaloader
 
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -41,30 +52,90 @@ TARGET_IG_USERNAME: str = os.getenv("TARGET_IG_USERNAME", "jenjenivive")
 # Optional login (NOT required for public accounts):
 INSTAGRAM_LOGIN_USERNAME: str | None = os.getenv("INSTAGRAM_LOGIN_USERNAME")
 INSTAGRAM_LOGIN_PASSWORD: str | None = os.getenv("INSTAGRAM_LOGIN_PASSWORD")
+# Saved login cookies, reused across runs to skip the login handshake:
+INSTAGRAM_SESSION_FILE: str = os.getenv(
+    "INSTAGRAM_SESSION_FILE", ".instaloader-session"
+)
 
 # YouTube OAuth credentials (from get_yt_refresh_token.py):
 YT_CLIENT_ID: str | None = os.getenv("YT_CLIENT_ID")
 YT_CLIENT_SECRET: str | None = os.getenv("YT_CLIENT_SECRET")
 YT_REFRESH_TOKEN: str | None = os.getenv("YT_REFRESH_TOKEN")
 
+# Optional call to action for descriptions (defaults to seo_utils.CTA_TEMPLATE):
+YT_DESCRIPTION_CTA: str | None = os.getenv("YT_DESCRIPTION_CTA")
+
 # Misc:
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 STATE_FILE = "state.json"
 DOWNLOAD_FOLDER = "downloads"
 UPLOADED_FOLDER = "uploaded_videos"
 LOG_FILE = "upload_log.txt"
+# Instagram shows up to 3 pinned posts first, regardless of their date.
+MAX_PINNED_POSTS = 3
+
+# Resumable upload tuning. -1 uploads in a single request; any other chunk
+# size must be at least 256 KB and is rounded down to a multiple of 256 KB.
+_YT_CHUNK_ALIGN = 256 * 1024
+YT_UPLOAD_CHUNK: int = int(os.getenv("YT_UPLOAD_CHUNK", str(64 * 1024 * 1024)))
+if YT_UPLOAD_CHUNK != -1:
+    if YT_UPLOAD_CHUNK < _YT_CHUNK_ALIGN:
+        raise RuntimeError(
+            f"YT_UPLOAD_CHUNK must be -1 or at least {_YT_CHUNK_ALIGN} bytes, "
+            f"got {YT_UPLOAD_CHUNK}."
+        )
+    YT_UPLOAD_CHUNK -= YT_UPLOAD_CHUNK % _YT_CHUNK_ALIGN
+YT_UPLOAD_MAX_RETRIES: int = int(os.getenv("YT_UPLOAD_MAX_RETRIES", "5"))
+RETRIABLE_STATUS_CODES = {500, 502, 503, 504}
+RETRIABLE_EXCEPTIONS = (
+    ConnectionError,
+    TimeoutError,
+    ssl.SSLError,
+    http.client.HTTPException,
+    httplib2.HttpLib2Error,
+)
 
 
 # --- Utilities ---
 
 
-def log(message: str) -> None:
+# One buffered handle for the whole run, opened on first use and flushed at
+# run boundaries and errors.
+_LOG_FH: TextIO | None = None
+
+
+def log(message: str, flush: bool = False) -> None:
     """Log to stdout and append to upload_log.txt."""
+    global _LOG_FH
+
     timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
     line = f"[{timestamp}] {message}\n"
     print(line, end="")
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(line)
+    if _LOG_FH is None:
+        _LOG_FH = open(LOG_FILE, "a", encoding="utf-8", buffering=8192)
+        atexit.register(_LOG_FH.close)
+    _LOG_FH.write(line)
+    if flush:
+        _LOG_FH.flush()
+
+
+def move_file(src: str | Path, dest: str | Path) -> None:
+    """Rename src to dest, copying with a 1 MiB buffer across filesystems."""
+    try:
+        os.replace(src, dest)
+    except OSError as exc:
+        # Only a cross-device rename is worth retrying as a copy.
+        if exc.errno != errno.EXDEV:
+            raise
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            try:
+                shutil.copyfileobj(fsrc, fdst, length=1024 * 1024)
+            except BaseException:
+                # Don't leave a truncated copy behind.
+                fdst.close()
+                os.unlink(dest)
+                raise
+        os.unlink(src)
 
 
 def load_state() -> dict:
@@ -85,30 +156,39 @@ def save_state(state: dict) -> None:
         json.dump(state, f, indent=2)
 
 
+# Reused across uploads; only refreshed once the access token expires.
+_YT_CREDS: Credentials | None = None
+
+
 def get_youtube_service():
     """Create a YouTube API client using a refresh token."""
+    global _YT_CREDS
+
     if not (YT_CLIENT_ID and YT_CLIENT_SECRET and YT_REFRESH_TOKEN):
         raise RuntimeError(
             "YouTube credentials missing. Set YT_CLIENT_ID, YT_CLIENT_SECRET, "
             "and YT_REFRESH_TOKEN as environment variables."
         )
 
-    creds = Credentials(
-        token=None,
-        refresh_token=YT_REFRESH_TOKEN,
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=YT_CLIENT_ID,
-        client_secret=YT_CLIENT_SECRET,
-        scopes=SCOPES,
-    )
-    creds.refresh(Request())
-    return build("youtube", "v3", credentials=creds)
+    if _YT_CREDS is None:
+        _YT_CREDS = Credentials(
+            token=None,
+            refresh_token=YT_REFRESH_TOKEN,
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=YT_CLIENT_ID,
+            client_secret=YT_CLIENT_SECRET,
+            scopes=SCOPES,
+        )
+    if not _YT_CREDS.valid:
+        _YT_CREDS.refresh(Request())
+    return build("youtube", "v3", credentials=_YT_CREDS)
 
 
 def get_instaloader() -> instaloader.Instaloader:
     """
     Create an Instaloader instance.
-    - If INSTAGRAM_LOGIN_* are provided, attempt login.
+    - If INSTAGRAM_LOGIN_* are provided, reuse the saved session file,
+      falling back to a fresh login (which then refreshes the file).
     - Otherwise, use guest mode (fine for public accounts like @jenjenivive).
     """
     loader = instaloader.Instaloader(
@@ -119,26 +199,124 @@ def get_instaloader() -> instaloader.Instaloader:
     )
 
     if INSTAGRAM_LOGIN_USERNAME and INSTAGRAM_LOGIN_PASSWORD:
+        try:
+            loader.load_session_from_file(
+                INSTAGRAM_LOGIN_USERNAME, INSTAGRAM_SESSION_FILE
+            )
+            if loader.test_login() == INSTAGRAM_LOGIN_USERNAME:
+                log(f"Reused Instagram session for @{INSTAGRAM_LOGIN_USERNAME}")
+                return loader
+            log("Saved Instagram session is no longer valid, logging in again.")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            log(f"Could not load Instagram session: {e}", flush=True)
+
         try:
             loader.login(INSTAGRAM_LOGIN_USERNAME, INSTAGRAM_LOGIN_PASSWORD)
             log(f"Logged in to Instagram as @{INSTAGRAM_LOGIN_USERNAME}")
         except Exception as e:
-            log(f"Instagram login failed, continuing as guest: {e}")
+            log(f"Instagram login failed, continuing as guest: {e}", flush=True)
+            return loader
+
+        try:
+            loader.save_session_to_file(INSTAGRAM_SESSION_FILE)
+        except Exception as e:
+            log(f"Could not save Instagram session: {e}", flush=True)
     else:
         log("No Instagram login provided. Using guest mode (public posts only).")
 
     return loader
 
 
-def get_all_video_posts(
-    loader: instaloader.Instaloader, username: str
-) -> List[instaloader.Post]:
-    """Return all video posts from the given profile, sorted oldest → newest."""
+def _takewhile_newer(
+    posts: Iterator[instaloader.Post], newer_than: datetime
+) -> Iterator[instaloader.Post]:
+    """
+    Yield posts until the first one not newer than `newer_than`. The first
+    MAX_PINNED_POSTS posts may be pinned (out of date order), so older ones
+    among them are skipped instead of ending the walk.
+    """
+    for i, post in enumerate(posts):
+        if post.date_utc > newer_than:
+            yield post
+        elif i >= MAX_PINNED_POSTS:
+            return
+
+
+def iter_video_posts(
+    loader: instaloader.Instaloader,
+    username: str,
+    newer_than: datetime | None = None,
+) -> Iterator[instaloader.Post]:
+    """
+    Lazily yield video posts from the given profile, newest → oldest.
+    With `newer_than`, profile pages are only fetched up to that date.
+    """
     profile = instaloader.Profile.from_username(loader.context, username)
-    posts = [p for p in profile.get_posts() if p.is_video]
-    posts_sorted = sorted(posts, key=lambda p: p.date_utc)
-    log(f"Found {len(posts_sorted)} video posts for @{username}.")
-    return posts_sorted
+    posts = profile.get_posts()
+    if newer_than is not None:
+        posts = _takewhile_newer(posts, newer_than)
+    yield from filter(lambda p: p.is_video, posts)
+
+
+def sync_queue(
+    loader: instaloader.Instaloader, username: str, state: dict
+) -> list[str]:
+    """
+    Bring state["queue"] (video shortcodes, oldest → newest) up to date.
+    The first run walks the whole profile; later runs only fetch posts
+    newer than state["newest_utc"].
+    """
+    queue: list[str] = state.get("queue") or []
+    newest = state.get("newest_utc")
+    if queue and newest:
+        posts = iter_video_posts(
+            loader, username, newer_than=datetime.fromisoformat(newest)
+        )
+    else:
+        log("Building the upload queue from the full profile.")
+        posts = iter_video_posts(loader, username)
+
+    # A pinned post can show up both at the top and in date order.
+    known = set(queue)
+    found = sorted(
+        {p.shortcode: p.date_utc for p in posts if p.shortcode not in known}.items(),
+        key=lambda item: item[1],
+    )
+    if found:
+        queue.extend(shortcode for shortcode, _ in found)
+        state["queue"] = queue
+        state["newest_utc"] = found[-1][1].isoformat()
+        save_state(state)
+        log(f"Queued {len(found)} new video posts ({len(queue)} total).")
+    return queue
+
+
+def select_next_shortcodes(
+    loader: instaloader.Instaloader, username: str, state: dict, count: int = 1
+) -> list[str]:
+    """
+    Return the shortcodes of the next `count` queued posts, starting at
+    state["next_index"] and wrapping around at the end of the queue.
+    """
+    queue = sync_queue(loader, username, state)
+    if not queue:
+        return []
+    start = current_index(state)
+    take = min(count, len(queue))
+    return [queue[(start + k) % len(queue)] for k in range(take)]
+
+
+def current_index(state: dict) -> int:
+    """Return state["next_index"] wrapped to the length of the queue."""
+    return int(state.get("next_index", 0)) % len(state["queue"])
+
+
+def advance_cursor(state: dict) -> None:
+    """Move state["next_index"] past the current post and save state.json."""
+    state["next_index"] = (current_index(state) + 1) % len(state["queue"])
+    save_state(state)
 
 
 def download_post_video(
@@ -147,31 +325,38 @@ def download_post_video(
     """
     Download the Instagram post video and return (video_path, caption).
     """
-    loader.download_post(post, target=post.owner_username)
-    downloaded_dir = Path(DOWNLOAD_FOLDER) / post.owner_username
-
-    shortcode = post.shortcode
-    video_path: Path | None = None
-
-    # Find an mp4 file that contains the shortcode in the filename.
-    for candidate in downloaded_dir.glob("**/*.mp4"):
-        if shortcode in candidate.name:
-            video_path = candidate
-            break
-
-    # Fallback: if not found, just take the first mp4.
-    if video_path is None:
-        mp4_files = list(downloaded_dir.glob("**/*.mp4"))
-        if mp4_files:
-            video_path = mp4_files[0]
+    target = post.owner_username
+    loader.download_post(post, target=target)
+    # dirname_pattern is DOWNLOAD_FOLDER itself (no {target} placeholder).
+    downloaded_dir = Path(DOWNLOAD_FOLDER)
+
+    # Instaloader names files deterministically; check that path first.
+    stem = loader.format_filename(post, target=target)
+    video_path: Path | None = downloaded_dir / f"{stem}.mp4"
+
+    # Fallback: sidecar videos get an "_<n>" suffix on the same stem.
+    # Never pick an unrelated mp4 left over from another post.
+    if not video_path.is_file():
+        video_path = next(
+            (c for c in downloaded_dir.rglob("*.mp4") if c.name.startswith(stem)),
+            None,
+        )
 
     if video_path is None:
-        raise RuntimeError("Could not find downloaded video file.")
+        raise RuntimeError(f"Could not find downloaded video file {stem}.mp4.")
 
     caption = post.caption or ""
     return str(video_path), caption
 
 
+def download_shortcode(
+    loader: instaloader.Instaloader, shortcode: str
+) -> tuple[str, str]:
+    """Fetch a single post by shortcode and download its video."""
+    post = instaloader.Post.from_shortcode(loader.context, shortcode)
+    return download_post_video(loader, post)
+
+
 def upload_video_to_youtube(
     youtube,
     file_path: str,
@@ -183,7 +368,7 @@ def upload_video_to_youtube(
     """
     Upload a video file to YouTube and return the video ID.
     """
-    media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+    media = MediaFileUpload(file_path, chunksize=YT_UPLOAD_CHUNK, resumable=True)
     body = {
         "snippet": {
             "title": title,
@@ -200,85 +385,136 @@ def upload_video_to_youtube(
     )
 
     response = None
+    retry = 0
+    last_logged = -5
     while response is None:
-        status, response = request.next_chunk()
-        if status:
-            log(f"Upload progress: {int(status.progress() * 100)}%")
+        try:
+            status, response = request.next_chunk()
+        except HttpError as exc:
+            if exc.resp.status not in RETRIABLE_STATUS_CODES:
+                raise
+            error = f"HTTP {exc.resp.status}"
+        except RETRIABLE_EXCEPTIONS as exc:
+            error = repr(exc)
+        else:
+            retry = 0
+            # Only log progress in steps of at least 5%.
+            if status and int(status.progress() * 100) - last_logged >= 5:
+                last_logged = int(status.progress() * 100)
+                log(f"Upload progress: {last_logged}%")
+            continue
+
+        # Retriable failure: back off and resume from the last committed chunk.
+        retry += 1
+        if retry > YT_UPLOAD_MAX_RETRIES:
+            raise RuntimeError(f"Upload gave up after {retry - 1} retries: {error}")
+        delay = min(2**retry, 64) + random.random()
+        log(f"Chunk upload error ({error}), retry {retry} in {delay:.1f}s", flush=True)
+        time.sleep(delay)
 
     video_id = response.get("id")
     log(f"Uploaded video: https://youtu.be/{video_id}")
     return video_id
 
 
-def run_one_upload() -> bool:
+def upload_post(youtube, video_path: str, caption: str) -> bool:
     """
-    Perform a single upload:
-      - pick next post
-      - download
+    Upload one downloaded video:
       - SEO
       - upload
-      - update state
+      - archive the file
     """
-    log("=== New upload run started ===")
-
-    loader = get_instaloader()
-    posts = get_all_video_posts(loader, TARGET_IG_USERNAME)
-    if not posts:
-        log("No video posts found. Exiting.")
-        return False
-
-    state = load_state()
-    index = int(state.get("next_index", 0)) % len(posts)
-
-    post = posts[index]
-    shortcode = post.shortcode
-    log(f"Selected post index={index}, shortcode={shortcode}")
-
-    # Download video
-    try:
-        video_path, caption = download_post_video(loader, post)
-        log(f"Downloaded video to {video_path}")
-    except Exception as exc:
-        log(f"Error downloading post {shortcode}: {exc}")
-        # Skip this one to avoid being stuck
-        state["next_index"] = (index + 1) % len(posts)
-        save_state(state)
-        log("Advanced index after failed download.")
-        return False
-
     # Prepare SEO
-    title, description, tags = generate_seo_from_caption(caption)
+    title, description, tags = generate_seo_from_caption(
+        caption, cta=YT_DESCRIPTION_CTA
+    )
     log(f"Generated title: {title}")
     log(f"Generated tags: {tags}")
 
     # Upload to YouTube
-    try:
-        youtube = get_youtube_service()
-    except Exception as exc:
-        log(f"YouTube auth failed: {exc}")
-        return False
-
     try:
         video_id = upload_video_to_youtube(
             youtube, video_path, title, description, tags
         )
     except Exception as exc:
-        log(f"Upload failed: {exc}")
+        log(f"Upload failed: {exc}", flush=True)
         return False
 
     # Move uploaded file to archive folder
     Path(UPLOADED_FOLDER).mkdir(exist_ok=True)
     dest = Path(UPLOADED_FOLDER) / Path(video_path).name
-    shutil.move(video_path, dest)
+    move_file(video_path, dest)
     log(f"Moved uploaded file to {dest}")
+    return True
 
-    # Advance index
-    state["next_index"] = (index + 1) % len(posts)
-    save_state(state)
-    log(f"Updated state.next_index → {state['next_index']}")
 
-    log("=== Upload run completed successfully ===")
-    return True
+def run_uploads(count: int = 1) -> int:
+    """
+    Perform up to `count` uploads and return how many succeeded:
+      - pick the next posts
+      - download (the next post downloads while the current one uploads)
+      - upload
+      - update state after each post, in order
+    """
+    log("=== New upload run started ===", flush=True)
+
+    # Authenticate once; the client is shared by every upload in this run.
+    try:
+        youtube = get_youtube_service()
+    except Exception as exc:
+        log(f"YouTube auth failed: {exc}", flush=True)
+        return 0
+
+    loader = get_instaloader()
+    state = load_state()
+    shortcodes = select_next_shortcodes(loader, TARGET_IG_USERNAME, state, count)
+    if not shortcodes:
+        log("No video posts found. Exiting.", flush=True)
+        return 0
+
+    uploaded = 0
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = pool.submit(download_shortcode, loader, shortcodes[0])
+        for i, shortcode in enumerate(shortcodes):
+            log(f"Selected post index={current_index(state)}, shortcode={shortcode}")
+
+            download = pending
+            if i + 1 < len(shortcodes):
+                pending = pool.submit(download_shortcode, loader, shortcodes[i + 1])
+
+            # Download video
+            try:
+                video_path, caption = download.result()
+                log(f"Downloaded video to {video_path}")
+            except Exception as exc:
+                log(f"Error downloading post {shortcode}: {exc}", flush=True)
+                # Skip this one to avoid being stuck
+                advance_cursor(state)
+                log("Advanced index after failed download.")
+                continue
+
+            if not upload_post(youtube, video_path, caption):
+                # Leave the index here so the next run retries this post.
+                log("Stopping run; this post will be retried next time.")
+                if pending is not download and not pending.cancel():
+                    # Prefetch already running: let it finish, then drop the
+                    # file so it cannot be mistaken for a later download.
+                    try:
+                        Path(pending.result()[0]).unlink(missing_ok=True)
+                    except Exception:
+                        pass
+                break
+
+            # Advance index
+            advance_cursor(state)
+            log(f"Updated state.next_index → {state['next_index']}")
+            uploaded += 1
+
+    log(
+        f"=== Upload run completed: {uploaded}/{len(shortcodes)} uploaded ===",
+        flush=True,
+    )
+    return uploaded
 
 
 def main() -> None:
@@ -287,9 +523,7 @@ def main() -> None:
     In GitHub Actions we run this job twice per day, with UPLOAD_COUNT=1.
     """
     uploads_to_do = int(os.getenv("UPLOAD_COUNT", "1"))
-    for _ in range(uploads_to_do):
-        run_one_upload()
-        time.sleep(5)
+    run_uploads(uploads_to_do)
 
 
 if __name__ == "__main__":